@@ -1,8 +1,77 @@
+import bisect
+import hashlib
+import httpx
+import io
 import pandas as pd
-import json
+import orjson
 import os
+import re
 from typing import Dict, List, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+# ijson enables incremental parsing of streamed detection responses;
+# without it we simply parse once at end of stream
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Precompiled keyword patterns for column classification.
+# Compiled once at import so analyze_excel_structure (which runs per-upload)
+# doesn't pay regex compilation on every call.
+AMOUNT_COLUMN_RE = re.compile(r'amount|total|revenue|pay|earning|salary|rate')
+ENTITY_COLUMN_RE = re.compile(r'name|dispatch|driver|broker|customer|vendor')
+
+def _classify_columns(columns: List) -> (List, List):
+    """
+    Classify headers into potential amount and entity columns.
+
+    Instead of running a regex per header, all headers are joined into one
+    NUL-separated buffer and each pattern scans it once; match offsets are
+    mapped back to column indexes. Keeps the scan O(total header bytes)
+    even for very wide sheets.
+
+    Args:
+        columns: Column labels from the DataFrame
+
+    Returns:
+        Tuple of (amount columns, entity columns)
+    """
+    lowered = [str(col).lower() for col in columns]
+    joined = '\x00'.join(lowered)
+
+    # Start offset of each header within the joined buffer
+    starts = []
+    offset = 0
+    for low in lowered:
+        starts.append(offset)
+        offset += len(low) + 1
+
+    def scan(pattern):
+        hits = []
+        seen = set()
+        for match in pattern.finditer(joined):
+            idx = bisect.bisect_right(starts, match.start()) - 1
+            if idx not in seen:
+                seen.add(idx)
+                hits.append(columns[idx])
+        return hits
+
+    return scan(AMOUNT_COLUMN_RE), scan(ENTITY_COLUMN_RE)
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP/2 client for OpenAI API calls.
+
+    A single shared client keeps TLS connections alive and multiplexes
+    concurrent requests over one stream; pass the result into
+    AIExcelAnalyzer(http_client=...) when the bot starts up.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=httpx.Timeout(30, connect=5)
+    )
 
 class AIExcelAnalyzer:
     """
@@ -10,14 +79,54 @@ class AIExcelAnalyzer:
     and detect possible analysis categories.
     """
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize with OpenAI API key"""
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
+        """
+        Initialize with OpenAI API key.
+
+        Args:
+            api_key: OpenAI API key (defaults to OPENAI_API_KEY env var)
+            http_client: Optional shared httpx client; pass one so
+                concurrent requests reuse a pooled HTTP/2 connection
+                instead of re-establishing TLS per call
+        """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY in .env file")
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = AsyncOpenAI(
+            api_key=self.api_key,
+            http_client=http_client or create_http_client(),
+            max_retries=2
+        )
+
+        # Response caches so recurring uploads of the same spreadsheet
+        # schema skip the API round-trip entirely
+        self._detection_cache: Dict[str, List[Dict]] = {}
+        self._suggestion_cache: Dict[tuple, Dict] = {}
+
+    _CACHE_MAX_ENTRIES = 256
 
-    def analyze_excel_structure(self, df: pd.DataFrame) -> Dict:
+    @staticmethod
+    def _structure_signature(structure: Dict) -> str:
+        """
+        Stable hash of the structure fields that actually shape the
+        detection prompt (column names + dtypes).
+        """
+        # Column labels aren't always strings (numeric header cells give
+        # int/float labels) and orjson refuses non-str dict keys
+        payload = orjson.dumps({
+            'cols': [str(c) for c in structure['stats']['column_names']],
+            'dtypes': {str(k): v for k, v in structure['dtypes'].items()}
+        })
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def _cache_put(self, cache: Dict, key, value):
+        """Insert into a cache dict, evicting the oldest entry when full"""
+        if len(cache) >= self._CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        cache[key] = value
+
+    @staticmethod
+    def analyze_excel_structure(df: pd.DataFrame) -> Dict:
         """
         Analyze the structure of an Excel DataFrame.
 
@@ -30,14 +139,19 @@ class AIExcelAnalyzer:
         # Get column information
         columns = df.columns.tolist()
 
-        # Get data types
-        dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+        # Get data types (read df.dtypes once and reuse it below)
+        dtypes_series = df.dtypes
+        dtypes = {col: str(dtype) for col, dtype in dtypes_series.items()}
 
-        # Get sample data (first 10 non-null rows)
+        # Get sample data (first 10 non-null rows).
+        # Work on a bounded head slice so sampling stays O(200 x columns)
+        # instead of scanning every full column on large files, and cast to
+        # string vectorized instead of per-element str().
         sample_data = {}
+        head_df = df.head(200)
         for col in columns:
-            non_null = df[col].dropna().head(10).tolist()
-            sample_data[col] = [str(val) for val in non_null]
+            non_null = head_df[col].dropna().head(10)
+            sample_data[col] = non_null.astype(str).tolist()
 
         # Get basic statistics
         stats = {
@@ -46,20 +160,13 @@ class AIExcelAnalyzer:
             'column_names': columns
         }
 
-        # Detect numeric columns
-        numeric_cols = df.select_dtypes(include=['number', 'float64', 'int64']).columns.tolist()
-
-        # Detect potential amount/money columns
-        potential_amount_cols = [
-            col for col in columns
-            if any(keyword in col.lower() for keyword in ['amount', 'total', 'revenue', 'pay', 'earning', 'salary', 'rate'])
-        ]
+        # Detect numeric columns from the dtypes we already have - avoids
+        # the extra dtype scan (and column subsetting) of df.select_dtypes
+        numeric_cols = [col for col, dtype in dtypes_series.items() if pd.api.types.is_numeric_dtype(dtype)]
 
-        # Detect potential name/entity columns
-        potential_entity_cols = [
-            col for col in columns
-            if any(keyword in col.lower() for keyword in ['name', 'dispatch', 'driver', 'broker', 'customer', 'vendor'])
-        ]
+        # Detect potential amount/money and name/entity columns with one
+        # scan over the concatenated headers per pattern
+        potential_amount_cols, potential_entity_cols = _classify_columns(columns)
 
         structure = {
             'stats': stats,
@@ -72,21 +179,62 @@ class AIExcelAnalyzer:
 
         return structure
 
-    def detect_categories(self, structure: Dict) -> List[Dict]:
+    @staticmethod
+    def _parse_partial_categories(buf: bytes) -> List[Dict]:
+        """
+        Extract the complete category objects from a (possibly truncated)
+        streamed JSON response.
+
+        Args:
+            buf: Response bytes accumulated so far
+
+        Returns:
+            List of category dicts fully received so far
+        """
+        if ijson is None:
+            return []
+
+        items = []
+        try:
+            for item in ijson.items(io.BytesIO(buf), 'categories.item'):
+                items.append(item)
+        except ijson.common.IncompleteJSONError:
+            pass
+        return items
+
+    async def detect_categories(self, structure: Dict, on_category=None) -> List[Dict]:
         """
         Use AI to detect possible analysis categories from the Excel structure.
 
+        The completion is streamed; as each category object finishes
+        arriving, on_category (if given) is invoked with it so downstream
+        work (e.g. scheduling a suggestion call) can overlap the rest of
+        the generation instead of waiting for the full response.
+
         Args:
             structure: Excel structure from analyze_excel_structure()
+            on_category: Optional callback invoked with each category dict
+                as soon as it is fully received
 
         Returns:
             List of detected category dictionaries
         """
+        # Repeat uploads of the same schema produce an identical prompt -
+        # serve the cached response instead of re-asking the API
+        sig = self._structure_signature(structure)
+        if sig in self._detection_cache:
+            categories = self._detection_cache[sig]
+            if on_category:
+                for category in categories:
+                    on_category(category)
+            return categories
+
         # Prepare prompt for GPT
         prompt = self._build_detection_prompt(structure)
+        emitted = 0
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {
@@ -123,18 +271,43 @@ class AIExcelAnalyzer:
                     }
                 ],
                 temperature=0.3,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                stream=True
             )
 
-            result = json.loads(response.choices[0].message.content)
-            return result.get('categories', [])
+            # Accumulate the stream; each time a category object completes,
+            # hand it to the callback so downstream work starts immediately
+            buf = bytearray()
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                buf += delta.encode()
+                if on_category:
+                    complete = self._parse_partial_categories(bytes(buf))
+                    for category in complete[emitted:]:
+                        on_category(category)
+                    emitted = len(complete)
+
+            result = orjson.loads(bytes(buf))
+            categories = result.get('categories', [])
+            if on_category:
+                for category in categories[emitted:]:
+                    on_category(category)
+            self._cache_put(self._detection_cache, sig, categories)
+            return categories
 
         except Exception as e:
             print(f"Error calling OpenAI API: {e}")
-            # Fallback to rule-based detection
-            return self._fallback_detection(structure)
-
-    def suggest_calculation_method(self, category: Dict, structure: Dict) -> Dict:
+            # Fallback to rule-based detection (skip the callback if part
+            # of the streamed response was already handed out)
+            categories = self._fallback_detection(structure)
+            if on_category and emitted == 0:
+                for category in categories:
+                    on_category(category)
+            return categories
+
+    async def suggest_calculation_method(self, category: Dict, structure: Dict) -> Dict:
         """
         Use AI to suggest how to calculate earnings for a category.
 
@@ -145,13 +318,26 @@ class AIExcelAnalyzer:
         Returns:
             Dictionary with calculation suggestions
         """
+        cache_key = (
+            category['name'],
+            category['entity_column'],
+            tuple(category['amount_columns']),
+            self._structure_signature(structure)
+        )
+        if cache_key in self._suggestion_cache:
+            return self._suggestion_cache[cache_key]
+
+        # Compact JSON with a handful of samples per column - indentation
+        # and extra rows only inflate the prompt token count
+        sample_preview = {col: values[:5] for col, values in structure['sample_data'].items()}
+
         prompt = f"""
         I have a spreadsheet category: {category['name']}
         Entity column: {category['entity_column']}
         Amount columns: {category['amount_columns']}
 
         Sample data:
-        {json.dumps(structure['sample_data'], indent=2)}
+        {orjson.dumps(sample_preview, option=orjson.OPT_NON_STR_KEYS).decode()}
 
         Suggest the best calculation method for this category.
         Should each entity get:
@@ -169,7 +355,7 @@ class AIExcelAnalyzer:
         """
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
                 messages=[
                     {
@@ -185,7 +371,9 @@ class AIExcelAnalyzer:
                 response_format={"type": "json_object"}
             )
 
-            return json.loads(response.choices[0].message.content)
+            suggestion = orjson.loads(response.choices[0].message.content)
+            self._cache_put(self._suggestion_cache, cache_key, suggestion)
+            return suggestion
 
         except Exception as e:
             print(f"Error suggesting calculation: {e}")
@@ -195,6 +383,105 @@ class AIExcelAnalyzer:
                 "example": "Entity earns X% of their total revenue"
             }
 
+    async def suggest_calculation_methods_batch(
+        self,
+        categories: List[Dict],
+        structure: Dict,
+        batch_size: int = 6
+    ) -> List[Dict]:
+        """
+        Suggest calculation methods for several categories in one LLM call.
+
+        Marshals all categories into a single prompt asking for a JSON array
+        of suggestions, so K categories cost one round-trip instead of K.
+
+        Args:
+            categories: Detected category dictionaries
+            structure: Excel structure
+            batch_size: Max categories per request (kept small to avoid
+                latency growth on very long prompts)
+
+        Returns:
+            List of suggestion dictionaries, one per category (same order)
+        """
+        suggestions = []
+
+        for start in range(0, len(categories), batch_size):
+            batch = categories[start:start + batch_size]
+
+            items = [
+                {
+                    'index': i,
+                    'name': cat['name'],
+                    'entity_column': cat['entity_column'],
+                    'amount_columns': cat['amount_columns']
+                }
+                for i, cat in enumerate(batch)
+            ]
+
+            prompt = f"""
+            I have these spreadsheet categories:
+            {orjson.dumps(items).decode()}
+
+            Sample data:
+            {orjson.dumps(structure['sample_data'], option=orjson.OPT_NON_STR_KEYS).decode()}
+
+            For EACH category, suggest the best calculation method.
+            Should each entity get:
+            1. A percentage of their total amount?
+            2. A flat rate per transaction?
+            3. Just show totals (no earnings calculation)?
+            4. Something else?
+
+            Return JSON with one suggestion per category, in input order:
+            {{
+                "suggestions": [
+                    {{
+                        "method": "percentage" | "flat_rate" | "sum_only" | "custom",
+                        "reasoning": "Why this method is appropriate",
+                        "example": "Example calculation"
+                    }}
+                ]
+            }}
+            """
+
+            try:
+                response = await self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a financial analyst helping determine calculation methods for earnings analysis."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
+
+                batch_suggestions = orjson.loads(response.choices[0].message.content).get('suggestions', [])
+
+            except Exception as e:
+                print(f"Error suggesting calculations in batch: {e}")
+                batch_suggestions = []
+
+            # Map results back by position; pad with the default if the
+            # model returned fewer suggestions than categories
+            for i in range(len(batch)):
+                if i < len(batch_suggestions):
+                    suggestions.append(batch_suggestions[i])
+                else:
+                    suggestions.append({
+                        "method": "percentage",
+                        "reasoning": "Default to percentage-based calculation",
+                        "example": "Entity earns X% of their total revenue"
+                    })
+
+        return suggestions
+
     def _build_detection_prompt(self, structure: Dict) -> str:
         """Build a prompt for category detection"""
         prompt = f"""
@@ -227,7 +514,8 @@ class AIExcelAnalyzer:
 
         return prompt
 
-    def _fallback_detection(self, structure: Dict) -> List[Dict]:
+    @staticmethod
+    def _fallback_detection(structure: Dict) -> List[Dict]:
         """
         Fallback rule-based detection when AI is unavailable.
 
@@ -1,7 +1,8 @@
 import logging
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-import json
+import io
+import orjson
 import os
 from dotenv import load_dotenv
 from excel_processor import process_excel_file
@@ -19,21 +20,67 @@ logger = logging.getLogger(__name__)
 # File to store dispatcher percentages
 CONFIG_FILE = 'dispatcher_config.json'
 
+# Report separators, built once
+WEEK_SEPARATOR = "─" * 17
+OVERALL_SEPARATOR = "═" * 19
+
+# Stay safely under Telegram's 4096-character message limit
+MAX_MESSAGE_LENGTH = 4000
+
+# Pre-bound money formatter - avoids re-parsing the format spec on every
+# call in the report loops
+money = "${:,.2f}".format
+
+def pack_messages(messages, limit=MAX_MESSAGE_LENGTH):
+    """
+    Greedily pack report sections into as few Telegram messages as possible.
+
+    Args:
+        messages: List of report section strings
+        limit: Max characters per packed message
+
+    Returns:
+        List of packed message strings, each within the limit
+    """
+    chunks = []
+    current = ''
+
+    for msg in messages:
+        if current and len(current) + len(msg) + 2 > limit:
+            chunks.append(current)
+            current = msg
+        elif current:
+            current = f"{current}\n\n{msg}"
+        else:
+            current = msg
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
 class DispatcherBot:
     def __init__(self):
         self.dispatcher_percentages = self.load_config()
 
     def load_config(self):
         """Load dispatcher percentages from config file"""
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        # Open directly and catch the miss - avoids the extra stat syscall
+        # of an os.path.exists check before every open
+        try:
+            with open(CONFIG_FILE, 'rb') as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return {}
 
     def save_config(self):
         """Save dispatcher percentages to config file"""
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(self.dispatcher_percentages, f, indent=2)
+        # Write to a temp file and rename into place so a crash mid-write
+        # can never leave a truncated config behind
+        tmp_file = CONFIG_FILE + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(self.dispatcher_percentages, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, CONFIG_FILE)
 
 bot_instance = DispatcherBot()
 
@@ -93,11 +140,11 @@ async def view_config(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No configuration set yet. Use /setconfig to add dispatchers.")
         return
 
-    config_text = "📊 Current Dispatcher Percentages:\n\n"
+    parts = ["📊 Current Dispatcher Percentages:\n\n"]
     for dispatcher, percentage in bot_instance.dispatcher_percentages.items():
-        config_text += f"• {dispatcher}: {percentage}%\n"
+        parts.append(f"• {dispatcher}: {percentage}%\n")
 
-    await update.message.reply_text(config_text)
+    await update.message.reply_text(''.join(parts))
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages for configuration input"""
@@ -119,11 +166,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 bot_instance.dispatcher_percentages = new_config
                 bot_instance.save_config()
 
-                response = "✅ Configuration saved successfully!\n\n"
+                parts = ["✅ Configuration saved successfully!\n\n"]
                 for dispatcher, percentage in new_config.items():
-                    response += f"• {dispatcher}: {percentage}%\n"
+                    parts.append(f"• {dispatcher}: {percentage}%\n")
 
-                await update.message.reply_text(response)
+                await update.message.reply_text(''.join(parts))
                 context.user_data['awaiting_config'] = False
             else:
                 await update.message.reply_text("❌ No valid configuration found. Please try again.")
@@ -149,86 +196,67 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         await update.message.reply_text("📥 Processing your file...")
 
-        # Download the file
+        # Download the file straight into memory - no temp file on disk
         file = await document.get_file()
-        file_path = f"temp_{document.file_name}"
-        await file.download_to_drive(file_path)
+        buf = io.BytesIO(await file.download_as_bytearray())
 
         # Process the Excel file
-        results = process_excel_file(file_path, bot_instance.dispatcher_percentages)
+        results = process_excel_file(buf, bot_instance.dispatcher_percentages)
 
         # Format and send results - Weekly breakdown
         messages = []
 
-        # Process each week
-        for week, week_data in results['weeks'].items():
-            response = f"📅 **Week: {week}**\n\n"
-
-            week_total_revenue = 0
-            week_total_earnings = 0
+        # Aggregate totals once, vectorized, instead of re-summing
+        # dispatcher by dispatcher while formatting
+        summary_df = results['summary_df']
+        overall_df = results['overall_df']
+        week_totals = summary_df.groupby('week', sort=False)[['total_amount', 'earnings']].sum()
+        grand_totals = overall_df[['total_amount', 'earnings']].sum()
 
-            for dispatcher, data in sorted(week_data.items()):
-                total_amount = data['total_amount']
-                percentage = data['percentage']
-                earnings = data['earnings']
+        # Process each week. Build each message as a list of fragments and
+        # join once - repeated += on a growing string is O(N^2) copying
+        for week, week_df in summary_df.groupby('week', sort=False):
+            parts = [f"📅 **Week: {week}**\n\n"]
 
+            for row in week_df.sort_values('dispatcher').itertuples():
                 # Only show dispatchers with non-zero revenue
-                if total_amount > 0:
-                    week_total_revenue += total_amount
-                    week_total_earnings += earnings
+                if row.total_amount > 0:
+                    parts.append(f"👤 **{row.dispatcher}**\n")
+                    parts.append(f"   Revenue: {money(row.total_amount)}\n")
+                    parts.append(f"   Percentage: {row.percentage}%\n")
+                    parts.append(f"   Earnings: {money(row.earnings)}\n\n")
 
-                    response += f"👤 **{dispatcher}**\n"
-                    response += f"   Revenue: ${total_amount:,.2f}\n"
-                    response += f"   Percentage: {percentage}%\n"
-                    response += f"   Earnings: ${earnings:,.2f}\n\n"
+            parts.append(f"{WEEK_SEPARATOR}\n")
+            parts.append(f"Week Total: {money(week_totals.loc[week, 'total_amount'])}\n")
+            parts.append(f"Week Earnings: {money(week_totals.loc[week, 'earnings'])}\n")
 
-            response += f"─────────────────\n"
-            response += f"Week Total: ${week_total_revenue:,.2f}\n"
-            response += f"Week Earnings: ${week_total_earnings:,.2f}\n"
-
-            messages.append(response)
+            messages.append(''.join(parts))
 
         # Overall summary
-        overall_response = f"📊 **Overall Summary - {document.file_name}**\n\n"
-
-        grand_total_revenue = 0
-        grand_total_earnings = 0
+        parts = [f"📊 **Overall Summary - {document.file_name}**\n\n"]
 
-        for dispatcher, data in sorted(results['overall'].items()):
-            total_amount = data['total_amount']
-            percentage = data['percentage']
-            earnings = data['earnings']
+        for row in overall_df.sort_values('dispatcher').itertuples():
+            parts.append(f"👤 **{row.dispatcher}**\n")
+            parts.append(f"   Total Revenue: {money(row.total_amount)}\n")
+            parts.append(f"   Percentage: {row.percentage}%\n")
+            parts.append(f"   Total Earnings: {money(row.earnings)}\n\n")
 
-            grand_total_revenue += total_amount
-            grand_total_earnings += earnings
+        parts.append(f"{OVERALL_SEPARATOR}\n")
+        parts.append(f"📈 Grand Total Revenue: {money(grand_totals['total_amount'])}\n")
+        parts.append(f"💰 Grand Total Earnings: {money(grand_totals['earnings'])}\n")
 
-            overall_response += f"👤 **{dispatcher}**\n"
-            overall_response += f"   Total Revenue: ${total_amount:,.2f}\n"
-            overall_response += f"   Percentage: {percentage}%\n"
-            overall_response += f"   Total Earnings: ${earnings:,.2f}\n\n"
+        messages.append(''.join(parts))
 
-        overall_response += f"═══════════════════\n"
-        overall_response += f"📈 Grand Total Revenue: ${grand_total_revenue:,.2f}\n"
-        overall_response += f"💰 Grand Total Earnings: ${grand_total_earnings:,.2f}\n"
-
-        messages.append(overall_response)
-
-        # Send all messages
-        for msg in messages:
-            await update.message.reply_text(msg)
-
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # Pack sections up to the message limit; send sequentially so
+        # Telegram delivers the sections in report order
+        chunks = pack_messages(messages)
+        for chunk in chunks:
+            await update.message.reply_text(chunk)
 
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         await update.message.reply_text(f"❌ Error processing file: {str(e)}")
 
-        # Clean up temporary file in case of error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
 def main():
     """Start the bot."""
     # Get token from .env file
@@ -1,4 +1,9 @@
+import asyncio
+import io
 import logging
+import re
+import shutil
+import tempfile
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 import json
@@ -8,7 +13,14 @@ from typing import Dict
 from dotenv import load_dotenv
 
 # Import new modules
-from ai_analyzer import AIExcelAnalyzer
+from ai_analyzer import AIExcelAnalyzer, create_http_client
+
+# Optional: calamine's workbook API gives a row iterator, which lets
+# oversized files be read chunk by chunk instead of in one allocation
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
 from config_manager import ConfigManager
 from universal_processor import UniversalExcelProcessor
 from report_generator import ReportGenerator
@@ -24,6 +36,171 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Files above this size are read through the chunked calamine path
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+
+# Rows per DataFrame chunk in the chunked reader
+EXCEL_CHUNK_ROWS = 100_000
+
+def iter_excel_chunks(file, chunksize: int = EXCEL_CHUNK_ROWS):
+    """
+    Yield DataFrames of at most chunksize rows from the first sheet,
+    using calamine's lazy row iterator. Peak memory stays at one chunk
+    instead of the whole sheet, which pd.read_excel cannot do for xlsx.
+
+    Args:
+        file: Path or file-like object
+        chunksize: Max rows per yielded DataFrame
+
+    Yields:
+        pandas DataFrames sharing the sheet's header row as columns
+    """
+    if hasattr(file, 'read'):
+        workbook = CalamineWorkbook.from_filelike(file)
+    else:
+        workbook = CalamineWorkbook.from_path(file)
+
+    rows = workbook.get_sheet_by_index(0).iter_rows()
+    header = next(rows, None)
+    if header is None:
+        return
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunksize:
+            yield pd.DataFrame(batch, columns=header)
+            batch = []
+
+    if batch:
+        yield pd.DataFrame(batch, columns=header)
+
+def read_excel_file(file, size: int = None):
+    """
+    Parse an Excel file with the Rust-backed calamine engine, falling back
+    to pandas' default reader when python-calamine isn't installed.
+
+    Oversized files are assembled from calamine's row iterator in
+    fixed-size chunks, avoiding the reader's whole-sheet intermediate.
+
+    Args:
+        file: Path or file-like object
+        size: File size in bytes, if known (routes large files to the
+            chunked reader)
+
+    Returns:
+        pandas DataFrame
+    """
+    if CalamineWorkbook is not None and size is not None and size > LARGE_FILE_BYTES:
+        return pd.concat(iter_excel_chunks(file), ignore_index=True)
+
+    # ImportError: python-calamine missing; ValueError: pandas too old
+    # to know the engine at all
+    try:
+        return pd.read_excel(file, engine='calamine')
+    except (ImportError, ValueError):
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return pd.read_excel(file)
+
+def shrink_dataframe(df: pd.DataFrame, entity_columns=()) -> pd.DataFrame:
+    """
+    Shrink the DataFrame's memory footprint in place.
+
+    Integer columns are downcast to the narrowest dtype that holds their
+    values (lossless), and entity columns become 'category' dtype so
+    groupby/unique on them scale with the number of distinct names
+    instead of the number of rows. Float columns stay float64: float32
+    only carries ~7 significant digits, which silently drops cents from
+    larger money amounts.
+
+    Args:
+        df: DataFrame to shrink
+        entity_columns: Columns holding entity names to categorize
+
+    Returns:
+        The same DataFrame, modified in place
+    """
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    for col in entity_columns:
+        if col in df.columns and (
+            pd.api.types.is_object_dtype(df[col].dtype)
+            or pd.api.types.is_string_dtype(df[col].dtype)
+        ):
+            df[col] = df[col].astype('category')
+
+    return df
+
+def extract_entities(column: pd.Series):
+    """
+    Get the unique, non-empty entity names from a column in one
+    vectorized pass.
+
+    Categorical columns are read through their category dictionary, so
+    the work scales with the number of distinct names, not rows.
+
+    Args:
+        column: DataFrame column holding entity names
+
+    Returns:
+        List of unique entity name strings
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        cats = column.cat.remove_unused_categories().cat.categories
+        cleaned = (str(c).strip() for c in cats)
+        return [s for s in dict.fromkeys(cleaned) if s and s.lower() != 'nan']
+
+    series = column.dropna().astype(str).str.strip()
+    return series[series.ne('') & series.str.lower().ne('nan')].unique().tolist()
+
+# Session keys cleared together when a configuration flow ends
+_SETCONFIG_KEYS = ('setconfig_mode', 'setconfig_category', 'setconfig_entities', 'setconfig_category_id')
+_AWAITING_KEYS = ('awaiting_config_category', 'config_entities', 'ai_suggestion')
+
+def _clear_session_keys(context: ContextTypes.DEFAULT_TYPE, keys):
+    """Pop a group of conversation-state keys, ignoring missing ones"""
+    for key in keys:
+        context.user_data.pop(key, None)
+
+def spool_dataframe(df: pd.DataFrame, path: str):
+    """
+    Write the session DataFrame to disk as Arrow/Feather.
+
+    A Feather spool keeps only a path in context.user_data instead of a
+    full pandas object per session, so peak memory no longer grows with
+    sessions held x file size. Object columns are cast to their string
+    form first since Arrow can't store mixed-type Python objects.
+
+    Args:
+        df: DataFrame to spool
+        path: Destination .feather path
+    """
+    spooled = df.reset_index(drop=True)
+    object_cols = [col for col, dtype in spooled.dtypes.items() if dtype == object]
+    if object_cols:
+        spooled = spooled.copy()
+        spooled[object_cols] = spooled[object_cols].astype(str)
+    spooled.to_feather(path)
+
+def load_session_df(context: ContextTypes.DEFAULT_TYPE) -> pd.DataFrame:
+    """
+    Return the session's DataFrame, reloading from the Feather spool
+    (or the in-memory fallback if spooling wasn't possible).
+    """
+    df = context.user_data.get('df')
+    if df is not None:
+        return df
+    return pd.read_feather(context.user_data['df_path'])
+
+def cleanup_session_df(context: ContextTypes.DEFAULT_TYPE):
+    """Remove the session's Feather spool directory, if any"""
+    df_path = context.user_data.get('df_path')
+    if df_path:
+        shutil.rmtree(os.path.dirname(df_path), ignore_errors=True)
+
 class IntelligentDispatchBot:
     """Enhanced bot with AI-powered analysis"""
 
@@ -36,20 +213,23 @@ class IntelligentDispatchBot:
         # Initialize AI analyzer (will be created when needed to handle API key)
         self.ai_analyzer = None
 
+        # Shared pooled HTTP client so every OpenAI request reuses one
+        # keep-alive HTTP/2 connection instead of re-doing TLS handshakes
+        self.http_client = create_http_client()
+
     def get_ai_analyzer(self):
         """Lazy initialization of AI analyzer"""
         if self.ai_analyzer is None:
             try:
-                self.ai_analyzer = AIExcelAnalyzer()
+                self.ai_analyzer = AIExcelAnalyzer(http_client=self.http_client)
             except ValueError as e:
                 logger.warning(f"AI Analyzer not available: {e}")
         return self.ai_analyzer
 
 bot_instance = IntelligentDispatchBot()
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Send welcome message"""
-    welcome_message = """
+# Static message blobs, built once at import instead of per handler call
+_WELCOME_MSG = """
 🤖 **Welcome to AI-Powered Excel Analysis Bot!**
 
 I can intelligently analyze any Excel file and provide comprehensive reports.
@@ -75,7 +255,43 @@ I can intelligently analyze any Excel file and provide comprehensive reports.
 Just send me an Excel file 📊
 Or use /setconfig to set up your configurations first!
 """
-    await update.message.reply_text(welcome_message)
+
+_SETCONFIG_MENU = """
+🔧 **Pre-Configure Analysis Categories**
+
+Choose which category to configure:
+
+**1️⃣ Dispatcher Earnings**
+Calculate earnings for dispatchers based on percentages
+Example: Java: 1.5%, Baxa: 1.3%
+
+**2️⃣ Driver Payments**
+Calculate payments for drivers based on percentages
+Example: Driver1: 70%, Driver2: 65%
+
+**3️⃣ Broker Performance**
+Analyze broker revenue (sum only, no calculation)
+
+**How to use:**
+Reply with the number (1, 2, or 3) to configure that category.
+
+Or use `/cancel` to exit configuration mode.
+"""
+
+_ENTITY_LIST_PROMPT = (
+    "📝 **Configure {name}**\n\n"
+    "Please provide the list of {entity_type}s, one per line.\n\n"
+    "**Example:**\n"
+    "Java\n"
+    "Baxa\n"
+    "Jasur\n"
+    "Sherali\n\n"
+    "Send your list now:"
+)
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send welcome message"""
+    await update.message.reply_text(_WELCOME_MSG)
 
 async def show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show all configured categories"""
@@ -97,34 +313,10 @@ async def show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def setconfig_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /setconfig command to pre-configure categories"""
     # Clear any previous setconfig state
-    if 'setconfig_mode' in context.user_data:
-        del context.user_data['setconfig_mode']
-    if 'setconfig_category' in context.user_data:
-        del context.user_data['setconfig_category']
+    _clear_session_keys(context, _SETCONFIG_KEYS)
 
     # Show category selection menu
-    menu = """
-🔧 **Pre-Configure Analysis Categories**
-
-Choose which category to configure:
-
-**1️⃣ Dispatcher Earnings**
-Calculate earnings for dispatchers based on percentages
-Example: Java: 1.5%, Baxa: 1.3%
-
-**2️⃣ Driver Payments**
-Calculate payments for drivers based on percentages
-Example: Driver1: 70%, Driver2: 65%
-
-**3️⃣ Broker Performance**
-Analyze broker revenue (sum only, no calculation)
-
-**How to use:**
-Reply with the number (1, 2, or 3) to configure that category.
-
-Or use `/cancel` to exit configuration mode.
-"""
-    await update.message.reply_text(menu)
+    await update.message.reply_text(_SETCONFIG_MENU)
 
     # Set flag that we're in setconfig mode
     context.user_data['setconfig_mode'] = 'awaiting_category_selection'
@@ -163,25 +355,19 @@ async def handle_setconfig_flow(update: Update, context: ContextTypes.DEFAULT_TY
         context.user_data['setconfig_mode'] = 'awaiting_entity_list'
 
         # Ask for entity names
-        entity_type = category.name.split()[0]  # e.g., "Dispatcher" from "Dispatcher Earnings"
+        entity_type = category.entity_type  # e.g., "Dispatcher"
 
         await update.message.reply_text(
-            f"📝 **Configure {category.name}**\n\n"
-            f"Please provide the list of {entity_type.lower()}s, one per line.\n\n"
-            f"**Example:**\n"
-            f"Java\n"
-            f"Baxa\n"
-            f"Jasur\n"
-            f"Sherali\n\n"
-            f"Send your list now:"
+            _ENTITY_LIST_PROMPT.format(name=category.name, entity_type=entity_type.lower())
         )
 
     elif mode == 'awaiting_entity_list':
         # User sent entity names
         category = context.user_data['setconfig_category']
 
-        # Parse entity names (one per line)
-        entities = [line.strip() for line in text.split('\n') if line.strip()]
+        # Parse entity names (one per line) - one strip per line, and
+        # splitlines() handles \r\n pastes
+        entities = [s for s in map(str.strip, text.splitlines()) if s]
 
         if not entities:
             await update.message.reply_text(
@@ -227,10 +413,7 @@ async def handle_setconfig_flow(update: Update, context: ContextTypes.DEFAULT_TY
             )
 
             # Clear setconfig state
-            del context.user_data['setconfig_mode']
-            del context.user_data['setconfig_category']
-            del context.user_data['setconfig_entities']
-            del context.user_data['setconfig_category_id']
+            _clear_session_keys(context, _SETCONFIG_KEYS)
         else:
             await update.message.reply_text(
                 "❌ Invalid configuration. Please try again.\n\n"
@@ -246,19 +429,21 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Please send an Excel file (.xlsx or .xls)")
         return
 
-    # Clear any previous state when new file is uploaded
+    # Clear any previous state (and spooled frame) when new file is uploaded
+    cleanup_session_df(context)
     context.user_data.clear()
 
     try:
         await update.message.reply_text("📥 Analyzing your file...")
 
-        # Download the file
+        # Download straight into memory - avoids the disk round-trip and
+        # the temp_<name> collision between concurrent users
         file = await document.get_file()
-        file_path = f"temp_{document.file_name}"
-        await file.download_to_drive(file_path)
+        buf = io.BytesIO(await file.download_as_bytearray())
 
-        # Read Excel file
-        df = pd.read_excel(file_path)
+        # Read Excel file on a worker thread - parsing a big workbook
+        # inline would stall the event loop for every other chat
+        df = await asyncio.to_thread(read_excel_file, buf, document.file_size)
 
         # Analyze with AI
         analyzer = bot_instance.get_ai_analyzer()
@@ -266,14 +451,13 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if analyzer:
             # AI-powered analysis
             structure = analyzer.analyze_excel_structure(df)
-            detected_categories = analyzer.detect_categories(structure)
+            detected_categories = await analyzer.detect_categories(structure)
         else:
-            # Fallback: Use rule-based detection
+            # Fallback: Use rule-based detection (both helpers are static,
+            # no analyzer instance needed)
             logger.info("Using fallback detection (no AI)")
-            from ai_analyzer import AIExcelAnalyzer
-            temp_analyzer = AIExcelAnalyzer.__new__(AIExcelAnalyzer)
-            structure = temp_analyzer.analyze_excel_structure(df)
-            detected_categories = temp_analyzer._fallback_detection(structure)
+            structure = AIExcelAnalyzer.analyze_excel_structure(df)
+            detected_categories = AIExcelAnalyzer._fallback_detection(structure)
 
         if not detected_categories:
             await update.message.reply_text(
@@ -282,14 +466,40 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "• Dispatch, Driver, Broker\n"
                 "• Amount, Total, Revenue"
             )
-            os.remove(file_path)
             return
 
-        # Store detected categories and file info in context
-        context.user_data['pending_file'] = file_path
+        # Store detected categories and file info in context (keep the
+        # analyzed structure too so config prompts don't re-scan the frame)
         context.user_data['file_name'] = document.file_name
         context.user_data['detected_categories'] = detected_categories
-        context.user_data['df'] = df
+        context.user_data['structure'] = structure
+
+        # Precompute unique entities for every detected entity column in
+        # one pass now, so each config prompt reads from the cache instead
+        # of re-scanning a DataFrame column per user turn
+        needed_cols = {
+            cat['entity_column'] for cat in detected_categories
+            if cat.get('entity_column') in df.columns
+        }
+
+        # Shrink the frame before it enters the session: narrower numeric
+        # dtypes and categorical entity columns halve the bytes the
+        # processor's groupby path has to move later
+        df = shrink_dataframe(df, needed_cols)
+
+        context.user_data['entities_by_col'] = {
+            col: extract_entities(df[col]) for col in needed_cols
+        }
+
+        # Spool the DataFrame to a Feather file and keep only its path in
+        # the session; fall back to holding it in memory if spooling fails
+        df_path = os.path.join(tempfile.mkdtemp(prefix='ali_bot_'), 'df.feather')
+        try:
+            await asyncio.to_thread(spool_dataframe, df, df_path)
+            context.user_data['df_path'] = df_path
+        except Exception as spool_error:
+            logger.warning(f"Could not spool DataFrame to Feather: {spool_error}")
+            context.user_data['df'] = df
 
         # Show category selection menu
         menu = ReportGenerator.generate_category_selection_menu(detected_categories)
@@ -300,10 +510,6 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         error_msg = ReportGenerator.generate_error_message(e)
         await update.message.reply_text(error_msg)
 
-        # Clean up
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
 async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /analyze command"""
     if 'detected_categories' not in context.user_data:
@@ -352,6 +558,33 @@ async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['selected_categories'] = selected_categories
     context.user_data['current_category_index'] = 0
 
+    # Prefetch calculation-method suggestions for every selected category
+    # still needing config in one batched LLM call - the per-category
+    # config prompts then consume these instead of paying one round-trip
+    # each
+    context.user_data['ai_suggestions_by_name'] = {}
+    analyzer = bot_instance.get_ai_analyzer()
+    structure = context.user_data.get('structure')
+
+    if analyzer and structure:
+        need_config = []
+        for cat_data in selected_categories:
+            category = create_category_from_dict(cat_data)
+            if category.config_needed and not bot_instance.config_manager.has_category_config(category):
+                need_config.append(cat_data)
+
+        if len(need_config) > 1:
+            try:
+                suggestions = await analyzer.suggest_calculation_methods_batch(
+                    need_config, structure
+                )
+                context.user_data['ai_suggestions_by_name'] = {
+                    cat_data['name']: suggestion
+                    for cat_data, suggestion in zip(need_config, suggestions)
+                }
+            except Exception as e:
+                logger.warning(f"Could not prefetch AI suggestions: {e}")
+
     # Start processing first category
     await process_next_category(update, context)
 
@@ -385,22 +618,39 @@ async def request_category_config(
     cat_data: Dict
 ):
     """Request configuration for a category"""
-    df = context.user_data['df']
-
-    # Get unique entities
-    entities = df[category.entity_column].dropna().unique().tolist()
-    entities = [str(e).strip() for e in entities if str(e).strip() != 'nan']
-
-    # Get AI suggestion for calculation method
+    # Use the entities precomputed at upload time; only fall back to a
+    # column scan for a column that wasn't among the detected ones
+    entities_by_col = context.user_data.get('entities_by_col', {})
+    entities = entities_by_col.get(category.entity_column)
+
+    if entities is None:
+        df = await asyncio.to_thread(load_session_df, context)
+        entities = extract_entities(df[category.entity_column])
+        entities_by_col[category.entity_column] = entities
+        context.user_data['entities_by_col'] = entities_by_col
+
+    # Get AI suggestion for calculation method, reusing the structure
+    # analyzed at upload time instead of re-scanning the DataFrame
     analyzer = bot_instance.get_ai_analyzer()
     ai_suggestion = None
 
     if analyzer:
-        try:
+        structure = context.user_data.get('structure')
+        if structure is None:
+            df = await asyncio.to_thread(load_session_df, context)
             structure = analyzer.analyze_excel_structure(df)
-            ai_suggestion = analyzer.suggest_calculation_method(cat_data, structure)
-        except Exception as e:
-            logger.warning(f"Could not get AI suggestion: {e}")
+            context.user_data['structure'] = structure
+
+        # Use the suggestion prefetched by the batched call at /analyze
+        # time; fall back to a single call when it isn't there
+        prefetched = context.user_data.get('ai_suggestions_by_name', {})
+        ai_suggestion = prefetched.pop(cat_data['name'], None)
+
+        if ai_suggestion is None:
+            try:
+                ai_suggestion = await analyzer.suggest_calculation_method(cat_data, structure)
+            except Exception as e:
+                logger.warning(f"Could not get AI suggestion: {e}")
 
     # Store info for later
     context.user_data['awaiting_config_category'] = category
@@ -474,10 +724,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
 
             # Clear awaiting state
-            del context.user_data['awaiting_config_category']
-            del context.user_data['config_entities']
-            if 'ai_suggestion' in context.user_data:
-                del context.user_data['ai_suggestion']
+            _clear_session_keys(context, _AWAITING_KEYS)
 
             # Continue with analysis
             await run_category_analysis(update, context, category)
@@ -498,7 +745,7 @@ async def run_category_analysis(
 ):
     """Run analysis for a category"""
     try:
-        df = context.user_data['df']
+        df = await asyncio.to_thread(load_session_df, context)
         file_name = context.user_data['file_name']
         chat_id = update.effective_chat.id
 
@@ -510,17 +757,22 @@ async def run_category_analysis(
         # Get config
         config = bot_instance.config_manager.get_category_config(category)
 
-        # Process with universal processor
-        results = UniversalExcelProcessor.process_category(df, category, config)
+        # Process with universal processor off the event loop - pandas
+        # releases the GIL in its C kernels, so the bot stays responsive
+        results = await asyncio.to_thread(
+            UniversalExcelProcessor.process_category, df, category, config
+        )
 
         # Generate reports
         reports = ReportGenerator.generate_analysis_report(
             category, results, file_name
         )
 
-        # Send all report messages
-        for report in reports:
-            await context.bot.send_message(chat_id=chat_id, text=report)
+        # Pack reports up to the message limit; send sequentially so
+        # Telegram delivers the sections in report order
+        chunks = ReportGenerator.pack_reports(reports)
+        for chunk in chunks:
+            await context.bot.send_message(chat_id=chat_id, text=chunk)
 
         # Move to next category
         context.user_data['current_category_index'] += 1
@@ -546,53 +798,41 @@ async def finish_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await context.bot.send_message(chat_id=chat_id, text=summary)
 
-    # Clean up temp file
-    file_path = context.user_data.get('pending_file')
-    if file_path and os.path.exists(file_path):
-        os.remove(file_path)
-
     # Clear context
+    cleanup_session_df(context)
     context.user_data.clear()
 
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel current operation"""
-    # Clean up temp file
-    file_path = context.user_data.get('pending_file')
-    if file_path and os.path.exists(file_path):
-        os.remove(file_path)
-
+    cleanup_session_df(context)
     context.user_data.clear()
     await update.message.reply_text("✅ Operation cancelled.")
 
+# Category-name matcher for create_category_from_dict: one precompiled
+# case-insensitive scan instead of lowercasing plus per-keyword checks.
+# _CATEGORY_MAP is in priority order (dispatch wins over driver over
+# broker), matching the original keyword-check chain
+_CATEGORY_RE = re.compile(r'dispatch|driver|broker', re.IGNORECASE)
+_CATEGORY_MAP = {
+    'dispatch': DispatcherAnalysis,
+    'driver': DriverAnalysis,
+    'broker': BrokerAnalysis,
+}
+
 def create_category_from_dict(cat_data: Dict):
     """Create category object from dictionary"""
-    name = cat_data.get('name', '').lower()
+    # Unknown names fall back to the generic (dispatcher) category
+    found = {m.lower() for m in _CATEGORY_RE.findall(cat_data.get('name', ''))}
+    cat_class = next(
+        (cls for key, cls in _CATEGORY_MAP.items() if key in found),
+        DispatcherAnalysis
+    )
 
-    if 'dispatch' in name:
-        return DispatcherAnalysis(
-            entity_column=cat_data['entity_column'],
-            amount_columns=cat_data['amount_columns'],
-            confidence=cat_data.get('confidence', 1.0)
-        )
-    elif 'driver' in name:
-        return DriverAnalysis(
-            entity_column=cat_data['entity_column'],
-            amount_columns=cat_data['amount_columns'],
-            confidence=cat_data.get('confidence', 1.0)
-        )
-    elif 'broker' in name:
-        return BrokerAnalysis(
-            entity_column=cat_data['entity_column'],
-            amount_columns=cat_data['amount_columns'],
-            confidence=cat_data.get('confidence', 1.0)
-        )
-    else:
-        # Generic category
-        return DispatcherAnalysis(
-            entity_column=cat_data['entity_column'],
-            amount_columns=cat_data['amount_columns'],
-            confidence=cat_data.get('confidence', 1.0)
-        )
+    return cat_class(
+        entity_column=cat_data['entity_column'],
+        amount_columns=cat_data['amount_columns'],
+        confidence=cat_data.get('confidence', 1.0)
+    )
 
 def main():
     """Start the bot"""
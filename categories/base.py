@@ -15,6 +15,20 @@ class AnalysisCategory(ABC):
     Each category represents a type of analysis that can be performed on Excel data.
     """
 
+    # Slotted instances skip the per-instance __dict__ - these objects are
+    # created per detected category per user and held in session state
+    __slots__ = (
+        'name',
+        'entity_column',
+        'amount_columns',
+        'grouping_columns',
+        'calculation_method',
+        'config_needed',
+        'description',
+        'confidence',
+        'category_id',
+    )
+
     def __init__(
         self,
         name: str,
@@ -47,6 +61,8 @@ class AnalysisCategory(ABC):
         self.config_needed = config_needed
         self.description = description
         self.confidence = confidence
+        # Derived once - the config id is read on every config load/save
+        self.category_id = name.lower().replace(' ', '_')
 
     @abstractmethod
     def get_config_prompt(self, entities: List[str]) -> str:
@@ -81,7 +97,7 @@ class AnalysisCategory(ABC):
         Returns:
             Lowercase, underscored identifier
         """
-        return self.name.lower().replace(' ', '_')
+        return self.category_id
 
     def to_dict(self) -> Dict:
         """
@@ -4,6 +4,10 @@ from .base import AnalysisCategory, CalculationMethod
 class BrokerAnalysis(AnalysisCategory):
     """Analysis category for broker/customer performance"""
 
+    __slots__ = ()
+
+    entity_type = "Broker"
+
     def __init__(
         self,
         entity_column: str,
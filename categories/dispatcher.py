@@ -1,9 +1,14 @@
+import numpy as np
 from typing import Dict, List
 from .base import AnalysisCategory, CalculationMethod
 
 class DispatcherAnalysis(AnalysisCategory):
     """Analysis category for dispatcher earnings"""
 
+    __slots__ = ()
+
+    entity_type = "Dispatcher"
+
     def __init__(
         self,
         entity_column: str,
@@ -62,7 +67,8 @@ class DispatcherAnalysis(AnalysisCategory):
         if not config:
             return False
 
-        for dispatcher, settings in config.items():
+        # Structural pass first - shape errors exit early
+        for settings in config.values():
             if not isinstance(settings, dict):
                 return False
 
@@ -72,14 +78,18 @@ class DispatcherAnalysis(AnalysisCategory):
             if settings['type'] != 'percentage':
                 return False
 
-            try:
-                value = float(settings['value'])
-                if value < 0 or value > 100:
-                    return False
-            except (ValueError, TypeError):
-                return False
+        # Range-check all values in one vectorized pass; a single
+        # conversion failure rejects the whole batch. fromiter coerces
+        # each element individually, so list/tuple values raise instead
+        # of silently building a 2-D array
+        try:
+            values = np.fromiter(
+                (s['value'] for s in config.values()), dtype=float, count=len(config)
+            )
+        except (ValueError, TypeError):
+            return False
 
-        return True
+        return bool(((values >= 0) & (values <= 100)).all())
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'DispatcherAnalysis':
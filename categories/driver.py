@@ -1,9 +1,14 @@
+import numpy as np
 from typing import Dict, List
 from .base import AnalysisCategory, CalculationMethod
 
 class DriverAnalysis(AnalysisCategory):
     """Analysis category for driver payments/earnings"""
 
+    __slots__ = ()
+
+    entity_type = "Driver"
+
     def __init__(
         self,
         entity_column: str,
@@ -62,26 +67,42 @@ class DriverAnalysis(AnalysisCategory):
         if not config:
             return False
 
-        for driver, settings in config.items():
+        # Structural pass first - shape errors exit early
+        for settings in config.values():
             if not isinstance(settings, dict):
                 return False
 
             if 'type' not in settings or 'value' not in settings:
                 return False
 
-            if settings['type'] not in ['percentage', 'flat_rate']:
+            if settings['type'] not in ('percentage', 'flat_rate'):
                 return False
 
-            try:
-                value = float(settings['value'])
-                if value < 0:
-                    return False
-                if settings['type'] == 'percentage' and value > 100:
-                    return False
-            except (ValueError, TypeError):
-                return False
+        # Range-check all values in one vectorized pass; a single
+        # conversion failure rejects the whole batch. fromiter coerces
+        # each element individually, so list/tuple values raise instead
+        # of silently building a 2-D array
+        try:
+            values = np.fromiter(
+                (s['value'] for s in config.values()), dtype=float, count=len(config)
+            )
+        except (ValueError, TypeError):
+            return False
 
-        return True
+        # None converts to NaN rather than raising, and NaN slips past
+        # the < / > comparisons below - reject it explicitly
+        if np.isnan(values).any():
+            return False
+
+        if (values < 0).any():
+            return False
+
+        is_percentage = np.fromiter(
+            (s['type'] == 'percentage' for s in config.values()),
+            dtype=bool,
+            count=len(config)
+        )
+        return not (values[is_percentage] > 100).any()
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'DriverAnalysis':
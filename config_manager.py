@@ -1,8 +1,40 @@
+import copy
 import json
 import os
+import re
 from typing import Dict, Optional, List
 from categories.base import AnalysisCategory
 
+# Serialize with Rust-backed orjson when available - stdlib json keeps
+# the manager working without it
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+
+# Parsed configs keyed by path -> (mtime_ns, config dict), so repeated
+# ConfigManager constructions skip the file read and JSON parse
+_CFG_CACHE: Dict[str, tuple] = {}
+
+# "Name: value" config line - captures the stripped name and raw value
+# The value group captures the rest of the line so embedded junk
+# ("1 500", "1.5% bonus") reaches float() and is rejected with the
+# usual warning instead of being silently truncated
+_CONFIG_LINE_RE = re.compile(r'^\s*([^:]+?)\s*:\s*(.+?)\s*$')
+
+# Strips %, $, and commas from values in one translate() pass
+_STRIP_TBL = str.maketrans('', '', '%$,')
+
 class ConfigManager:
     """
     Manages configuration for multiple analysis categories.
@@ -23,22 +55,45 @@ class ConfigManager:
         """
         Load configuration from file.
 
+        Serves from the module-level cache when the file hasn't changed
+        since it was last parsed (stat mtime match), so steady-state
+        loads are a dict lookup instead of a read+parse.
+
         Returns:
             Configuration dictionary
         """
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse {self.config_file}, using empty config")
-                return {}
-        return {}
+        try:
+            st = os.stat(self.config_file)
+        except FileNotFoundError:
+            return {}
+
+        cached = _CFG_CACHE.get(self.config_file)
+        if cached and cached[0] == st.st_mtime_ns:
+            return copy.deepcopy(cached[1])
+
+        try:
+            with open(self.config_file, 'rb') as f:
+                config = _loads(f.read())
+        except ValueError:
+            print(f"Warning: Could not parse {self.config_file}, using empty config")
+            return {}
+
+        _CFG_CACHE[self.config_file] = (st.st_mtime_ns, copy.deepcopy(config))
+        return config
 
     def save_config(self):
         """Save configuration to file"""
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        # Write to a temp file and rename into place so a crash mid-write
+        # can never leave a truncated config behind
+        tmp_file = self.config_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(_dumps(self.config))
+        os.replace(tmp_file, self.config_file)
+
+        _CFG_CACHE[self.config_file] = (
+            os.stat(self.config_file).st_mtime_ns,
+            copy.deepcopy(self.config)
+        )
 
     def get_category_config(self, category: AnalysisCategory) -> Optional[Dict]:
         """
@@ -50,7 +105,7 @@ class ConfigManager:
         Returns:
             Config dict or None if not configured
         """
-        category_id = category.get_category_id()
+        category_id = category.category_id
         return self.config.get(category_id)
 
     def set_category_config(self, category: AnalysisCategory, config: Dict):
@@ -61,7 +116,7 @@ class ConfigManager:
             category: Analysis category
             config: Configuration dictionary
         """
-        category_id = category.get_category_id()
+        category_id = category.category_id
         self.config[category_id] = config
         self.save_config()
 
@@ -75,7 +130,7 @@ class ConfigManager:
         Returns:
             True if configured
         """
-        category_id = category.get_category_id()
+        category_id = category.category_id
         return category_id in self.config and bool(self.config[category_id])
 
     def delete_category_config(self, category: AnalysisCategory):
@@ -85,7 +140,7 @@ class ConfigManager:
         Args:
             category: Analysis category
         """
-        category_id = category.get_category_id()
+        category_id = category.category_id
         if category_id in self.config:
             del self.config[category_id]
             self.save_config()
@@ -145,15 +200,14 @@ class ConfigManager:
         lines = text.strip().split('\n')
 
         for line in lines:
-            if ':' not in line:
+            match = _CONFIG_LINE_RE.match(line)
+            if not match:
                 continue
 
-            parts = line.split(':', 1)
-            entity_name = parts[0].strip()
-            value_str = parts[1].strip()
+            entity_name = match.group(1)
 
-            # Remove common symbols like %, $, commas
-            value_str = value_str.replace('%', '').replace('$', '').replace(',', '').strip()
+            # Remove common symbols like %, $, commas in one pass
+            value_str = match.group(2).translate(_STRIP_TBL)
 
             try:
                 value = float(value_str)
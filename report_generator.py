@@ -1,6 +1,73 @@
+from functools import lru_cache
 from typing import Dict, List, Optional
 from categories.base import AnalysisCategory, CalculationMethod
 
+# Stay safely under Telegram's 4096-character message limit
+MAX_MESSAGE_LENGTH = 4000
+
+# Bound format method for money values - one C call per amount on the
+# per-entity hot path instead of full f-string formatting
+_USD = "${:,.2f}".format
+
+
+def _fmt_percentage_parts(entity_name: str, data: Dict) -> List[str]:
+    """Entity fragments for PERCENTAGE categories"""
+    return [
+        f"👤 **{entity_name}**\n",
+        "   Revenue: " + _USD(data.get('total_amount', 0)) + "\n",
+        f"   Percentage: {data.get('percentage', 0)}%\n",
+        "   Earnings: " + _USD(data.get('earnings', 0)) + "\n",
+        "\n",
+    ]
+
+
+def _fmt_flat_rate_parts(entity_name: str, data: Dict) -> List[str]:
+    """Entity fragments for FLAT_RATE categories"""
+    return [
+        f"👤 **{entity_name}**\n",
+        "   Revenue: " + _USD(data.get('total_amount', 0)) + "\n",
+        "   Flat Rate: " + _USD(data.get('flat_rate', 0)) + "\n",
+        "   Earnings: " + _USD(data.get('earnings', 0)) + "\n",
+        "\n",
+    ]
+
+
+def _fmt_sum_only_parts(entity_name: str, data: Dict) -> List[str]:
+    """Entity fragments for SUM_ONLY (and unknown) categories - revenue only"""
+    return [
+        f"👤 **{entity_name}**\n",
+        "   Revenue: " + _USD(data.get('total_amount', 0)) + "\n",
+        "\n",
+    ]
+
+
+# Formatter per calculation method, selected once per report instead of
+# re-branching on category.calculation_method for every entity
+_FORMATTERS = {
+    CalculationMethod.PERCENTAGE: _fmt_percentage_parts,
+    CalculationMethod.FLAT_RATE: _fmt_flat_rate_parts,
+    CalculationMethod.SUM_ONLY: _fmt_sum_only_parts,
+}
+
+
+@lru_cache(maxsize=64)
+def _category_emoji(category_name: str) -> str:
+    """Get emoji for category name"""
+    name_lower = category_name.lower()
+
+    if 'dispatch' in name_lower:
+        return "📋"
+    elif 'driver' in name_lower:
+        return "🚗"
+    elif 'broker' in name_lower:
+        return "🏢"
+    elif 'equipment' in name_lower:
+        return "🚚"
+    elif 'route' in name_lower:
+        return "🗺️"
+    else:
+        return "📊"
+
 class ReportGenerator:
     """
     Generate formatted reports for any category type.
@@ -12,24 +79,27 @@ class ReportGenerator:
         category: AnalysisCategory,
         results: Dict,
         file_name: str
-    ) -> List[str]:
+    ) -> List[List[str]]:
         """
         Generate complete report for an analysis.
 
+        Sections stay as fragment lists all the way to pack_reports,
+        which joins each outgoing message exactly once.
+
         Args:
             category: Analysis category
             results: Results from UniversalExcelProcessor
             file_name: Name of the Excel file
 
         Returns:
-            List of message strings (one per week + overall)
+            List of fragment lists (one per week + overall)
         """
         messages = []
 
         # Generate weekly reports if available
         if 'weeks' in results and results['weeks']:
             for week, week_data in results['weeks'].items():
-                week_report = ReportGenerator._generate_week_report(
+                week_report = ReportGenerator._generate_week_report_parts(
                     category, week, week_data
                 )
                 if week_report:  # Only add if there's data
@@ -37,7 +107,7 @@ class ReportGenerator:
 
         # Generate overall summary
         if 'overall' in results and results['overall']:
-            overall_report = ReportGenerator._generate_overall_report(
+            overall_report = ReportGenerator._generate_overall_report_parts(
                 category, results['overall'], file_name
             )
             messages.append(overall_report)
@@ -45,13 +115,52 @@ class ReportGenerator:
         return messages
 
     @staticmethod
-    def _generate_week_report(
+    def pack_reports(
+        reports: List[List[str]],
+        limit: int = MAX_MESSAGE_LENGTH
+    ) -> List[str]:
+        """
+        Greedily pack report sections into as few Telegram messages as
+        possible, each within the message-length limit.
+
+        Args:
+            reports: Report sections as fragment lists
+            limit: Max characters per packed message
+
+        Returns:
+            List of packed message strings
+        """
+        chunks = []
+        current: List[str] = []
+        current_len = 0
+
+        for parts in reports:
+            section_len = sum(map(len, parts))
+            if current and current_len + section_len + 2 > limit:
+                chunks.append(''.join(current))
+                current = list(parts)
+                current_len = section_len
+            elif current:
+                current.append('\n\n')
+                current.extend(parts)
+                current_len += section_len + 2
+            else:
+                current = list(parts)
+                current_len = section_len
+
+        if current:
+            chunks.append(''.join(current))
+
+        return chunks
+
+    @staticmethod
+    def _generate_week_report_parts(
         category: AnalysisCategory,
         week: str,
         week_data: Dict
-    ) -> Optional[str]:
+    ) -> Optional[List[str]]:
         """
-        Generate report for a single week.
+        Generate report fragments for a single week.
 
         Args:
             category: Analysis category
@@ -59,58 +168,53 @@ class ReportGenerator:
             week_data: Data for this week
 
         Returns:
-            Formatted report string or None if no data
+            List of report fragments or None if no data
         """
-        # Calculate totals
+        # One pass over the dict: accumulate week totals and collect the
+        # printable (non-zero) rows as (revenue, name, data) tuples, so
+        # the sort compares revenue first without a key callable
+        items = []
         week_total_revenue = 0
         week_total_earnings = 0
 
-        for entity_data in week_data.values():
-            week_total_revenue += entity_data.get('total_amount', 0)
-            week_total_earnings += entity_data.get('earnings', 0)
+        for entity_name, data in week_data.items():
+            total_amount = data.get('total_amount', 0)
+            week_total_revenue += total_amount
+            week_total_earnings += data.get('earnings', 0)
+            if total_amount != 0:
+                items.append((total_amount, entity_name, data))
 
         # Skip if no revenue
         if week_total_revenue == 0:
             return None
 
-        # Build report
-        report = f"📅 **{week}**\n\n"
-
-        # Sort entities by revenue (descending)
-        sorted_entities = sorted(
-            week_data.items(),
-            key=lambda x: x[1].get('total_amount', 0),
-            reverse=True
-        )
-
-        for entity_name, data in sorted_entities:
-            total_amount = data.get('total_amount', 0)
+        items.sort(reverse=True)
 
-            # Skip entities with no revenue
-            if total_amount == 0:
-                continue
+        # Build report as a list of fragments joined once - repeated +=
+        # on a growing string copies O(N^2) bytes
+        parts = [f"📅 **{week}**\n\n"]
+        formatter = _FORMATTERS.get(category.calculation_method, _fmt_sum_only_parts)
 
-            report += ReportGenerator._format_entity_line(
-                entity_name, data, category
-            )
+        for _, entity_name, data in items:
+            parts.extend(formatter(entity_name, data))
 
         # Add week summary
-        report += f"\n─────────────────\n"
-        report += f"Week Total: ${week_total_revenue:,.2f}\n"
+        parts.append(f"\n─────────────────\n")
+        parts.append("Week Total: " + _USD(week_total_revenue) + "\n")
 
         if category.calculation_method != CalculationMethod.SUM_ONLY:
-            report += f"Week Earnings: ${week_total_earnings:,.2f}\n"
+            parts.append("Week Earnings: " + _USD(week_total_earnings) + "\n")
 
-        return report
+        return parts
 
     @staticmethod
-    def _generate_overall_report(
+    def _generate_overall_report_parts(
         category: AnalysisCategory,
         overall_data: Dict,
         file_name: str
-    ) -> str:
+    ) -> List[str]:
         """
-        Generate overall summary report.
+        Generate overall summary report fragments.
 
         Args:
             category: Analysis category
@@ -118,52 +222,49 @@ class ReportGenerator:
             file_name: Excel file name
 
         Returns:
-            Formatted report string
+            List of report fragments
         """
-        # Calculate grand totals
+        # One pass over the dict: accumulate grand totals and collect
+        # (revenue, name, data) tuples so the sort compares revenue
+        # first without a key callable
+        items = []
         grand_total_revenue = 0
         grand_total_earnings = 0
 
-        for entity_data in overall_data.values():
-            grand_total_revenue += entity_data.get('total_amount', 0)
-            grand_total_earnings += entity_data.get('earnings', 0)
-
-        # Build report
-        report = f"📊 **{category.name} - {file_name}**\n\n"
+        for entity_name, data in overall_data.items():
+            total_amount = data.get('total_amount', 0)
+            grand_total_revenue += total_amount
+            grand_total_earnings += data.get('earnings', 0)
+            items.append((total_amount, entity_name, data))
 
-        # Sort entities by revenue (descending)
-        sorted_entities = sorted(
-            overall_data.items(),
-            key=lambda x: x[1].get('total_amount', 0),
-            reverse=True
-        )
+        items.sort(reverse=True)
 
-        for entity_name, data in sorted_entities:
-            total_amount = data.get('total_amount', 0)
+        # Build report as a list of fragments joined once; all entities
+        # (even with 0) are shown in the overall report
+        parts = [f"📊 **{category.name} - {file_name}**\n\n"]
+        formatter = _FORMATTERS.get(category.calculation_method, _fmt_sum_only_parts)
 
-            # Show all entities (even with 0) in overall report
-            report += ReportGenerator._format_entity_line(
-                entity_name, data, category, show_zero=True
-            )
+        for _, entity_name, data in items:
+            parts.extend(formatter(entity_name, data))
 
         # Add grand summary
-        report += f"\n═══════════════════\n"
-        report += f"📈 Total Revenue: ${grand_total_revenue:,.2f}\n"
+        parts.append(f"\n═══════════════════\n")
+        parts.append("📈 Total Revenue: " + _USD(grand_total_revenue) + "\n")
 
         if category.calculation_method != CalculationMethod.SUM_ONLY:
-            report += f"💰 Total Earnings: ${grand_total_earnings:,.2f}\n"
+            parts.append("💰 Total Earnings: " + _USD(grand_total_earnings) + "\n")
 
-        return report
+        return parts
 
     @staticmethod
-    def _format_entity_line(
+    def _format_entity_parts(
         entity_name: str,
         data: Dict,
         category: AnalysisCategory,
         show_zero: bool = False
-    ) -> str:
+    ) -> List[str]:
         """
-        Format a single entity line for the report.
+        Format a single entity entry as report fragments.
 
         Args:
             entity_name: Name of entity
@@ -172,34 +273,26 @@ class ReportGenerator:
             show_zero: Whether to show entities with zero amounts
 
         Returns:
-            Formatted line string
+            List of fragments for the caller to extend into its report
         """
-        total_amount = data.get('total_amount', 0)
-
         # Skip zero amounts unless explicitly showing them
-        if not show_zero and total_amount == 0:
-            return ""
-
-        line = f"👤 **{entity_name}**\n"
-        line += f"   Revenue: ${total_amount:,.2f}\n"
-
-        # Add calculation-specific info
-        if category.calculation_method == CalculationMethod.PERCENTAGE:
-            percentage = data.get('percentage', 0)
-            earnings = data.get('earnings', 0)
-            line += f"   Percentage: {percentage}%\n"
-            line += f"   Earnings: ${earnings:,.2f}\n"
-
-        elif category.calculation_method == CalculationMethod.FLAT_RATE:
-            flat_rate = data.get('flat_rate', 0)
-            earnings = data.get('earnings', 0)
-            line += f"   Flat Rate: ${flat_rate:,.2f}\n"
-            line += f"   Earnings: ${earnings:,.2f}\n"
+        if not show_zero and data.get('total_amount', 0) == 0:
+            return []
 
-        # For SUM_ONLY, just show revenue (no earnings calculation)
+        formatter = _FORMATTERS.get(category.calculation_method, _fmt_sum_only_parts)
+        return formatter(entity_name, data)
 
-        line += "\n"
-        return line
+    @staticmethod
+    def _format_entity_line(
+        entity_name: str,
+        data: Dict,
+        category: AnalysisCategory,
+        show_zero: bool = False
+    ) -> str:
+        """Format a single entity entry as one string (see _format_entity_parts)"""
+        return ''.join(ReportGenerator._format_entity_parts(
+            entity_name, data, category, show_zero=show_zero
+        ))
 
     @staticmethod
     def generate_category_selection_menu(categories: List[Dict]) -> str:
@@ -215,44 +308,31 @@ class ReportGenerator:
         if not categories:
             return "❌ No analysis categories detected in this file."
 
-        menu = "📊 **Analysis Options Detected:**\n\n"
+        parts = ["📊 **Analysis Options Detected:**\n\n"]
 
         for i, cat in enumerate(categories, 1):
             emoji = ReportGenerator._get_category_emoji(cat['name'])
-            menu += f"{i}️⃣ {emoji} **{cat['name']}**\n"
-            menu += f"   {cat['description']}\n"
+            parts.append(f"{i}️⃣ {emoji} **{cat['name']}**\n")
+            parts.append(f"   {cat['description']}\n")
 
             # Show confidence if available
             if 'confidence' in cat and cat['confidence'] < 1.0:
-                menu += f"   (Confidence: {cat['confidence']*100:.0f}%)\n"
+                parts.append(f"   (Confidence: {cat['confidence']*100:.0f}%)\n")
 
-            menu += "\n"
+            parts.append("\n")
 
-        menu += "━━━━━━━━━━━━━━━━━━\n"
-        menu += "**How to proceed:**\n"
-        menu += "• Select specific: `/analyze 1 2`\n"
-        menu += "• Run all: `/analyze all`\n"
-        menu += "• Cancel: `/cancel`\n"
+        parts.append("━━━━━━━━━━━━━━━━━━\n")
+        parts.append("**How to proceed:**\n")
+        parts.append("• Select specific: `/analyze 1 2`\n")
+        parts.append("• Run all: `/analyze all`\n")
+        parts.append("• Cancel: `/cancel`\n")
 
-        return menu
+        return ''.join(parts)
 
-    @staticmethod
-    def _get_category_emoji(category_name: str) -> str:
-        """Get emoji for category name"""
-        name_lower = category_name.lower()
-
-        if 'dispatch' in name_lower:
-            return "📋"
-        elif 'driver' in name_lower:
-            return "🚗"
-        elif 'broker' in name_lower:
-            return "🏢"
-        elif 'equipment' in name_lower:
-            return "🚚"
-        elif 'route' in name_lower:
-            return "🗺️"
-        else:
-            return "📊"
+    # Module-level cached function (see _category_emoji) - the handful
+    # of category names repeat across menus and summaries, so the
+    # substring scans collapse to a cache hit
+    _get_category_emoji = staticmethod(_category_emoji)
 
     @staticmethod
     def generate_config_needed_message(
@@ -321,13 +401,15 @@ class ReportGenerator:
         Returns:
             Summary message
         """
-        summary = f"✅ **Analysis Complete!**\n\n"
-        summary += f"Ran {len(categories)} analysis type(s):\n"
+        parts = [
+            f"✅ **Analysis Complete!**\n\n",
+            f"Ran {len(categories)} analysis type(s):\n",
+        ]
 
         for cat in categories:
             emoji = ReportGenerator._get_category_emoji(cat['name'])
-            summary += f"• {emoji} {cat['name']}\n"
+            parts.append(f"• {emoji} {cat['name']}\n")
 
-        summary += f"\nSent {results_count} report message(s).\n"
+        parts.append(f"\nSent {results_count} report message(s).\n")
 
-        return summary
+        return ''.join(parts)
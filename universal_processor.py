@@ -3,6 +3,11 @@ import re
 from typing import Dict, List, Optional
 from categories.base import AnalysisCategory, CalculationMethod
 
+# Compiled once at import - avoids the per-call pattern-cache lookup in
+# the re module's convenience functions
+_WEEK_RE = re.compile(r'week\s*(\d+)', re.IGNORECASE)
+_AMOUNT_RE = re.compile(r'[^\d.\-]')
+
 class UniversalExcelProcessor:
     """
     Generic Excel processor that can handle any category type.
@@ -24,11 +29,21 @@ class UniversalExcelProcessor:
         if pd.isna(amount_str):
             return None
 
-        # Convert to string
+        # Numeric cells skip the string round-trip entirely
+        if isinstance(amount_str, (int, float)):
+            return float(amount_str)
+
+        # Plain numeric strings ("1500", "1500.50") parse directly;
+        # only decorated values ("1,500$", "700$+LUMP") pay for the
+        # regex strip
         amount_str = str(amount_str)
+        try:
+            return float(amount_str)
+        except ValueError:
+            pass
 
         # Remove all non-numeric characters except . and -
-        cleaned = re.sub(r'[^\d.-]', '', amount_str)
+        cleaned = _AMOUNT_RE.sub('', amount_str)
 
         # Try to convert to float
         try:
@@ -37,7 +52,11 @@ class UniversalExcelProcessor:
             return None
 
     @staticmethod
-    def detect_week_markers(df: pd.DataFrame, broker_column: str) -> pd.Series:
+    def detect_week_markers(
+        df: pd.DataFrame,
+        broker_column: str,
+        initial_week: str = "Before Week 1"
+    ) -> pd.Series:
         """
         Detect week markers in a DataFrame.
         Looks for rows like "Week 4", "Week 5", etc.
@@ -45,30 +64,26 @@ class UniversalExcelProcessor:
         Args:
             df: DataFrame
             broker_column: Name of the broker column
+            initial_week: Week label in effect before the first marker
+                (lets chunked callers carry state across chunk boundaries)
 
         Returns:
             Series with week labels for each row
         """
-        current_week = "Before Week 1"
-        week_list = []
-
-        for idx, row in df.iterrows():
-            broker_val = str(row[broker_column]).strip() if pd.notna(row[broker_column]) else ''
-
-            # Check if this row is a week marker
-            week_match = re.search(r'week\s*(\d+)', broker_val.lower())
-            if week_match:
-                current_week = f"Week {week_match.group(1)}"
-
-            week_list.append(current_week)
-
-        return pd.Series(week_list, index=df.index)
+        # One compiled regex sweep over the column, then a forward-fill:
+        # marker rows label themselves, later rows inherit the label,
+        # and rows before the first marker get the initial week
+        week_numbers = df[broker_column].astype(str).str.extract(
+            _WEEK_RE, expand=False
+        )
+        return ('Week ' + week_numbers).ffill().fillna(initial_week)
 
     @staticmethod
     def clean_dataframe(
         df: pd.DataFrame,
         entity_column: str,
-        amount_columns: List[str]
+        amount_columns: List[str],
+        keep_columns: List[str] = ()
     ) -> pd.DataFrame:
         """
         Clean and prepare DataFrame for analysis.
@@ -77,34 +92,39 @@ class UniversalExcelProcessor:
             df: Raw DataFrame
             entity_column: Column with entity names
             amount_columns: Columns with amounts
+            keep_columns: Extra columns (e.g. grouping columns) carried
+                through uncleaned, saving the caller a realignment pass
 
         Returns:
             Cleaned DataFrame
         """
         # Select relevant columns
-        cols_to_keep = [entity_column] + amount_columns
+        cols_to_keep = [entity_column] + amount_columns + [
+            c for c in keep_columns if c not in amount_columns and c != entity_column
+        ]
         df_clean = df[cols_to_keep].copy()
 
-        # Remove rows with missing amounts
-        df_clean = df_clean.dropna(subset=amount_columns, how='all')
-
-        # Clean amounts
-        for col in amount_columns:
-            df_clean[col] = df_clean[col].apply(UniversalExcelProcessor.clean_amount)
-
-        # Remove rows where amounts couldn't be converted
-        df_clean = df_clean.dropna(subset=amount_columns, how='all')
-
-        # Remove rows with zero or negative amounts
+        # Clean amounts - one vectorized regex sweep and numeric coercion
+        # per column instead of a Python clean_amount call per cell
         for col in amount_columns:
-            df_clean = df_clean[df_clean[col] > 0]
-
-        # Normalize entity names
-        df_clean[entity_column] = df_clean[entity_column].astype(str).str.strip()
+            cleaned = df_clean[col].astype(str).str.replace(_AMOUNT_RE, '', regex=True)
+            df_clean[col] = pd.to_numeric(cleaned, errors='coerce')
+
+        # One combined mask, one slice: every amount must be positive
+        # (missing/unparseable values fail the comparison) and the entity
+        # name non-empty and not the 'nan' string. The old chain of
+        # dropna/filter steps re-materialized the frame at each step
+        amounts = df_clean[amount_columns].to_numpy(dtype=float)
+        entity = df_clean[entity_column].astype(str).str.strip()
+        mask = (
+            (amounts > 0).all(axis=1)
+            & df_clean[entity_column].notna().to_numpy()
+            & entity.ne('').to_numpy()
+            & entity.ne('nan').to_numpy()
+        )
 
-        # Remove rows with empty entity names or 'nan' string
-        df_clean = df_clean[df_clean[entity_column] != 'nan']
-        df_clean = df_clean[df_clean[entity_column] != '']
+        df_clean = df_clean.loc[mask]
+        df_clean[entity_column] = entity[mask]
 
         return df_clean
 
@@ -139,56 +159,156 @@ class UniversalExcelProcessor:
                 broker_col = col
                 break
 
+        # Work on a local copy of the grouping columns - appending Week
+        # to the category instance would grow it across repeated files
+        group_cols = list(category.grouping_columns or [])
+
         # Add week detection if we have a broker column
-        if broker_col and category.grouping_columns:
+        if broker_col and group_cols:
             df = df.copy()
             df['Week'] = UniversalExcelProcessor.detect_week_markers(df, broker_col)
-            if 'Week' not in category.grouping_columns:
-                category.grouping_columns.append('Week')
-
-        # Clean the DataFrame (preserve grouping columns)
-        cols_for_cleaning = [category.entity_column] + category.amount_columns
-        if category.grouping_columns and 'Week' in df.columns:
-            cols_for_cleaning = cols_for_cleaning + category.grouping_columns
+            if 'Week' not in group_cols:
+                group_cols.append('Week')
 
+        # Clean the DataFrame, carrying the grouping columns through
+        # rather than re-aligning them onto the cleaned frame afterwards
+        keep_cols = [c for c in group_cols if c in df.columns]
         df_clean = UniversalExcelProcessor.clean_dataframe(
             df,
             category.entity_column,
-            category.amount_columns
+            category.amount_columns,
+            keep_columns=keep_cols
         )
 
-        # Re-add Week column if it was removed
-        if category.grouping_columns and 'Week' in df.columns and 'Week' not in df_clean.columns:
-            # Map week back using index
-            df_clean['Week'] = df.loc[df_clean.index, 'Week'].values
-
         # If we have grouping columns, process by groups
-        if category.grouping_columns:
+        if group_cols:
             return UniversalExcelProcessor._process_with_grouping(
-                df_clean, category, config
+                df_clean, category, config, group_cols
             )
         else:
             return UniversalExcelProcessor._process_without_grouping(
                 df_clean, category, config
             )
 
+    @staticmethod
+    def process_category_chunks(
+        chunks,
+        category: AnalysisCategory,
+        config: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Process an iterable of DataFrame chunks for a category.
+
+        Each chunk is cleaned and reduced to partial group-by sums, so
+        peak memory is one chunk plus the (small) aggregates. The partials
+        are merged at the end and fed through the same result builders as
+        process_category, which re-sums them per group. Week markers are
+        carried across chunk boundaries.
+
+        Args:
+            chunks: Iterable of pandas DataFrames (e.g. from a chunked
+                Excel reader)
+            category: AnalysisCategory instance
+            config: Configuration dictionary (entity -> config)
+
+        Returns:
+            Same results dictionary as process_category
+        """
+        entity_col = category.entity_column
+        amount_cols = category.amount_columns
+
+        # Local copy - Week is appended here, never on the category
+        group_cols = list(category.grouping_columns or [])
+
+        current_week = "Before Week 1"
+        partials = []
+
+        for chunk in chunks:
+            chunk.columns = chunk.columns.str.strip()
+
+            # Find broker column for week detection
+            broker_col = None
+            for col in chunk.columns:
+                if 'broker' in col.lower():
+                    broker_col = col
+                    break
+
+            if broker_col and group_cols:
+                chunk = chunk.copy()
+                weeks = UniversalExcelProcessor.detect_week_markers(
+                    chunk, broker_col, initial_week=current_week
+                )
+                chunk['Week'] = weeks
+                if len(weeks):
+                    current_week = weeks.iloc[-1]
+                if 'Week' not in group_cols:
+                    group_cols.append('Week')
+
+            keep_cols = [c for c in group_cols if c in chunk.columns]
+            df_clean = UniversalExcelProcessor.clean_dataframe(
+                chunk, entity_col, amount_cols, keep_columns=keep_cols
+            )
+
+            if df_clean.empty:
+                continue
+
+            partial_cols = group_cols + [entity_col]
+            partials.append(
+                df_clean.groupby(partial_cols)[amount_cols].sum().reset_index()
+            )
+
+        if partials:
+            merged = pd.concat(partials, ignore_index=True)
+        else:
+            merged = pd.DataFrame(columns=group_cols + [entity_col] + amount_cols)
+
+        # The result builders group-by-sum again, which folds partial sums
+        # for the same group from different chunks into one total
+        if group_cols:
+            return UniversalExcelProcessor._process_with_grouping(
+                merged, category, config, group_cols
+            )
+        else:
+            return UniversalExcelProcessor._process_without_grouping(
+                merged, category, config
+            )
+
     @staticmethod
     def _process_with_grouping(
         df: pd.DataFrame,
         category: AnalysisCategory,
-        config: Optional[Dict]
+        config: Optional[Dict],
+        grouping_columns: List[str]
     ) -> Dict:
         """Process data with grouping (e.g., by week)"""
         entity_col = category.entity_column
         amount_col = category.amount_columns[0]  # Use first amount column
 
+        # Lower the config keys once for the columnar config match
+        config_lc = {k.lower(): (k, v) for k, v in (config or {}).items()}
+
+        # Default row for each configured entity with no activity, built
+        # once instead of re-derived inside every week's fill loop
+        zero_rows = {
+            name: {
+                'total_amount': 0,
+                'percentage': cfg.get('value', 0),
+                'earnings': 0
+            }
+            for name, cfg in (config or {}).items()
+        }
+
         # Group by week and entity
-        group_cols = category.grouping_columns + [entity_col]
+        group_cols = grouping_columns + [entity_col]
         weekly_data = df.groupby(group_cols)[amount_col].sum().reset_index()
+        week_col = grouping_columns[0]
 
-        # Get unique weeks
-        week_col = category.grouping_columns[0]
-        weeks = weekly_data[week_col].unique()
+        # Enrich the grouped frame columnar-style: config match and
+        # earnings arithmetic run as whole-column operations, and the
+        # nested dicts are only materialized at the result boundary
+        weekly_data, value_cols = UniversalExcelProcessor._attach_earnings(
+            weekly_data, entity_col, amount_col, category, config_lc
+        )
 
         results = {
             'weeks': {},
@@ -196,51 +316,30 @@ class UniversalExcelProcessor:
         }
 
         # Process each week
-        for week in weeks:
-            week_df = weekly_data[weekly_data[week_col] == week]
-            week_results = {}
-
-            for _, row in week_df.iterrows():
-                entity = row[entity_col]
-                total_amount = row[amount_col]
-
-                # Calculate earnings based on config
-                earnings_data = UniversalExcelProcessor._calculate_earnings(
-                    entity, total_amount, category, config
-                )
-
-                week_results[earnings_data['entity_name']] = earnings_data
+        for week, week_df in weekly_data.groupby(week_col, sort=False):
+            week_results = UniversalExcelProcessor._rows_by_entity(
+                week_df, value_cols
+            )
 
             # Add entities from config that weren't in this week
-            if config:
-                for config_entity in config.keys():
-                    if config_entity not in week_results:
-                        week_results[config_entity] = {
-                            'total_amount': 0,
-                            'percentage': config[config_entity].get('value', 0),
-                            'earnings': 0
-                        }
+            for name, row in zero_rows.items():
+                week_results.setdefault(name, row.copy())
 
             results['weeks'][week] = week_results
 
-        # Calculate overall totals
-        overall_totals = df.groupby(entity_col)[amount_col].sum().to_dict()
-
-        for entity, total_amount in overall_totals.items():
-            earnings_data = UniversalExcelProcessor._calculate_earnings(
-                entity, total_amount, category, config
-            )
-            results['overall'][earnings_data['entity_name']] = earnings_data
+        # Calculate overall totals by folding the already-grouped weekly
+        # sums - no second scan over the row-level frame
+        overall = weekly_data.groupby(entity_col, as_index=False)['total_amount'].sum()
+        overall, value_cols = UniversalExcelProcessor._attach_earnings(
+            overall, entity_col, 'total_amount', category, config_lc
+        )
+        results['overall'] = UniversalExcelProcessor._rows_by_entity(
+            overall, value_cols
+        )
 
         # Add entities from config that weren't in the file
-        if config:
-            for config_entity in config.keys():
-                if config_entity not in results['overall']:
-                    results['overall'][config_entity] = {
-                        'total_amount': 0,
-                        'percentage': config[config_entity].get('value', 0),
-                        'earnings': 0
-                    }
+        for name, row in zero_rows.items():
+            results['overall'].setdefault(name, row.copy())
 
         return results
 
@@ -254,16 +353,20 @@ class UniversalExcelProcessor:
         entity_col = category.entity_column
         amount_col = category.amount_columns[0]
 
-        # Group by entity
-        entity_totals = df.groupby(entity_col)[amount_col].sum().to_dict()
+        # Lower the config keys once for the columnar config match
+        config_lc = {k.lower(): (k, v) for k, v in (config or {}).items()}
 
-        results = {'overall': {}}
+        # Group by entity and enrich columnar-style
+        entity_totals = df.groupby(entity_col, as_index=False)[amount_col].sum()
+        entity_totals, value_cols = UniversalExcelProcessor._attach_earnings(
+            entity_totals, entity_col, amount_col, category, config_lc
+        )
 
-        for entity, total_amount in entity_totals.items():
-            earnings_data = UniversalExcelProcessor._calculate_earnings(
-                entity, total_amount, category, config
+        results = {
+            'overall': UniversalExcelProcessor._rows_by_entity(
+                entity_totals, value_cols
             )
-            results['overall'][earnings_data['entity_name']] = earnings_data
+        }
 
         # Add entities from config that weren't in the file
         if config:
@@ -278,68 +381,68 @@ class UniversalExcelProcessor:
         return results
 
     @staticmethod
-    def _calculate_earnings(
-        entity: str,
-        total_amount: float,
+    def _rows_by_entity(frame: pd.DataFrame, value_cols: List[str]) -> Dict:
+        """
+        Convert an enriched totals frame to {entity_name: row dict}.
+
+        Spelling variants of one configured entity collapse to the same
+        name; keep the last row, matching the old dict-overwrite order.
+        """
+        frame = frame.drop_duplicates('entity_name', keep='last')
+        return frame.set_index('entity_name', drop=False)[value_cols].to_dict(
+            orient='index'
+        )
+
+    @staticmethod
+    def _attach_earnings(
+        frame: pd.DataFrame,
+        entity_col: str,
+        amount_col: str,
         category: AnalysisCategory,
-        config: Optional[Dict]
-    ) -> Dict:
+        config_lc: Dict
+    ) -> tuple:
         """
-        Calculate earnings for an entity based on category and config.
+        Attach config match and earnings columns to a grouped-totals frame.
+
+        Columnar replacement for the old per-entity _calculate_earnings
+        loop: the case-insensitive config match is a Series.map over the
+        lowered names and the earnings arithmetic runs on whole columns.
 
         Args:
-            entity: Entity name
-            total_amount: Total amount for this entity
+            frame: Frame with one row per (group, entity) total
+            entity_col: Column with entity names
+            amount_col: Column with summed amounts
             category: Analysis category
-            config: Configuration
+            config_lc: Config keyed by lowercased entity name, mapping to
+                (original name, config dict) pairs
 
         Returns:
-            Dict with total_amount, percentage/rate, and earnings
+            (enriched frame, list of per-entity result columns)
         """
-        # Try to find matching config (case-insensitive)
-        entity_config = None
-        matched_name = entity
-
-        if config:
-            for config_entity, config_data in config.items():
-                if entity.lower() == config_entity.lower():
-                    entity_config = config_data
-                    matched_name = config_entity
-                    break
-
-        # Calculate based on method
-        if category.calculation_method == CalculationMethod.SUM_ONLY:
-            return {
-                'entity_name': matched_name,
-                'total_amount': total_amount,
-                'percentage': 0,
-                'earnings': total_amount  # For sum_only, earnings = total
-            }
-
-        elif category.calculation_method == CalculationMethod.PERCENTAGE:
-            percentage = entity_config.get('value', 0) if entity_config else 0
-            earnings = (total_amount * percentage) / 100
-
-            return {
-                'entity_name': matched_name,
-                'total_amount': total_amount,
-                'percentage': percentage,
-                'earnings': earnings
-            }
-
-        elif category.calculation_method == CalculationMethod.FLAT_RATE:
-            flat_rate = entity_config.get('value', 0) if entity_config else 0
-
-            return {
-                'entity_name': matched_name,
-                'total_amount': total_amount,
-                'flat_rate': flat_rate,
-                'earnings': flat_rate
-            }
-
+        frame = frame.rename(columns={amount_col: 'total_amount'})
+
+        lc_names = frame[entity_col].astype(str).str.lower()
+        name_map = {lc: orig for lc, (orig, _) in config_lc.items()}
+        value_map = {lc: cfg.get('value', 0) for lc, (_, cfg) in config_lc.items()}
+
+        # Configured entities take the config spelling of their name
+        frame['entity_name'] = lc_names.map(name_map).fillna(frame[entity_col])
+
+        method = category.calculation_method
+        if method == CalculationMethod.SUM_ONLY:
+            frame['percentage'] = 0
+            frame['earnings'] = frame['total_amount']  # For sum_only, earnings = total
+            value_cols = ['entity_name', 'total_amount', 'percentage', 'earnings']
+        elif method == CalculationMethod.PERCENTAGE:
+            frame['percentage'] = lc_names.map(value_map).fillna(0)
+            frame['earnings'] = frame['total_amount'] * frame['percentage'] / 100
+            value_cols = ['entity_name', 'total_amount', 'percentage', 'earnings']
+        elif method == CalculationMethod.FLAT_RATE:
+            frame['flat_rate'] = lc_names.map(value_map).fillna(0)
+            frame['earnings'] = frame['flat_rate']
+            value_cols = ['entity_name', 'total_amount', 'flat_rate', 'earnings']
         else:  # CUSTOM or unknown
-            return {
-                'entity_name': matched_name,
-                'total_amount': total_amount,
-                'earnings': 0
-            }
+            frame['earnings'] = 0
+            value_cols = ['entity_name', 'total_amount', 'earnings']
+
+        return frame, value_cols